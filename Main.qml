@@ -2,6 +2,7 @@ import QtQuick
 import QtQuick.Window
 import QtQuick.Controls.Basic
 import QtQuick.Layouts
+import QtQuick.Dialogs
 import QtQml
 
 import "controls"
@@ -40,6 +41,13 @@ ApplicationWindow {
 
     Component.onCompleted: {
         enableUserInterface()
+        chatHistory.showSession(appController.sessionManager.activeSessionId)
+    }
+
+    // Profiling mode: write a memory snapshot on demand
+    Shortcut {
+        sequence: "Ctrl+Shift+M"
+        onActivated: appController.takeMemorySnapshot()
     }
 
     Connections {
@@ -57,15 +65,27 @@ ApplicationWindow {
             playVoice.isPlaying = false
         }
 
-        function onPostAnswer(answerText) {
-            chatHistory.appendMessage("Assistant", answerText, false)
+        function onMessageAdded(sessionId, messageId, isUser) {
+            chatHistory.appendMessage(sessionId, messageId, isUser)
         }
 
         function onPostNumTokens(numTokens) {
-            if (numTokens > 0) {
-                tokenCountLabel.text = qsTr("Tokens used: %1").arg(numTokens)
+            tokenCountLabel.text = numTokens > 0 ? qsTr("Tokens used: %1").arg(numTokens) : ""
+        }
+    }
+
+    Connections {
+        target: appController.sessionManager
+        function onSessionBusyChanged(sessionId, busy) {
+            if (sessionId === appController.sessionManager.activeSessionId) {
+                busy ? disableUserInterface() : enableUserInterface()
             }
         }
+
+        function onActiveSessionChanged(sessionId) {
+            chatHistory.showSession(sessionId)
+            appController.sessionManager.isBusy(sessionId) ? disableUserInterface() : enableUserInterface()
+        }
     }
 
     // Component for chat messages
@@ -74,7 +94,13 @@ ApplicationWindow {
 
         Rectangle {
             id: messageContainer
-            property var messageData
+            // Only ids are kept in the list; the text lives in the MessageStore
+            readonly property var messageData: model
+            // Texts evicted from memory are read back from the session file
+            readonly property string messageText: appController.messageText(messageData.messageId)
+                                                  || appController.sessionManager.storedMessageText(
+                                                         chatHistory.sessionId, messageData.offset)
+                                                  || qsTr("(message no longer in memory)")
 
             // Make width responsive to parent's width changes
             width: parent ? parent.width : 0
@@ -121,7 +147,7 @@ ApplicationWindow {
 
                     CopyButton {
                         textColor: root.textColor
-                        textToCopy: messageData.message
+                        textToCopy: messageText
                     }
 
                     Text {
@@ -135,7 +161,7 @@ ApplicationWindow {
                 // Message content with code detection
                 MessageContent {
                     Layout.fillWidth: true
-                    text: messageData.message
+                    text: messageText
                     textColor: root.textColor
                     codeBackgroundColor: root.codeBackgroundColor
                     codeBorderColor: root.codeBorderColor
@@ -214,6 +240,91 @@ ApplicationWindow {
             }
         }
 
+        // Session Tabs
+        RowLayout {
+            Layout.fillWidth: true
+            spacing: 6
+
+            Repeater {
+                model: appController.sessionManager.sessions
+
+                delegate: Rectangle {
+                    readonly property bool isActive: modelData.id === appController.sessionManager.activeSessionId
+
+                    Layout.preferredHeight: 32
+                    Layout.preferredWidth: tabRow.implicitWidth + 20
+                    color: isActive ? root.surfaceColor : Qt.darker(root.backgroundColor, 1.03)
+                    radius: 8
+                    border.color: isActive ? root.accentColor : root.borderColor
+                    border.width: 1
+
+                    MouseArea {
+                        anchors.fill: parent
+                        onClicked: appController.sessionManager.setActiveSession(modelData.id)
+                    }
+
+                    RowLayout {
+                        id: tabRow
+                        anchors.centerIn: parent
+                        spacing: 6
+
+                        Text {
+                            text: modelData.title
+                            font.pixelSize: 12
+                            font.weight: isActive ? Font.Bold : Font.Normal
+                            color: root.textColor
+                        }
+
+                        Text {
+                            text: "✕"
+                            font.pixelSize: 10
+                            color: root.textColor
+                            opacity: closeArea.containsMouse ? 1.0 : 0.5
+
+                            MouseArea {
+                                id: closeArea
+                                anchors.fill: parent
+                                anchors.margins: -4
+                                hoverEnabled: true
+                                onClicked: {
+                                    chatHistory.dropSession(modelData.id)
+                                    appController.sessionManager.closeSession(modelData.id)
+                                }
+                            }
+                        }
+                    }
+                }
+            }
+
+            Button {
+                Layout.preferredWidth: 32
+                Layout.preferredHeight: 32
+
+                background: Rectangle {
+                    color: parent.hovered ? Qt.lighter(root.primaryColor, 1.5) : root.primaryColor
+                    radius: 8
+                }
+
+                Text {
+                    anchors.centerIn: parent
+                    text: "+"
+                    color: "white"
+                    font.pixelSize: 16
+                    font.weight: Font.Bold
+                }
+
+                ToolTip.visible: hovered
+                ToolTip.text: qsTr("New Chat")
+
+                onClicked: {
+                    const sessionId = appController.sessionManager.createSession("")
+                    appController.sessionManager.setActiveSession(sessionId)
+                }
+            }
+
+            Item { Layout.fillWidth: true }
+        }
+
         // Chat History Area
         Rectangle {
             Layout.fillWidth: true
@@ -223,52 +334,184 @@ ApplicationWindow {
             border.color: root.borderColor
             border.width: 1
 
-            ScrollView {
-                id: chatScrollView
+            ListView {
+                id: chatHistory
                 anchors.fill: parent
                 anchors.margins: 15
                 clip: true
-                ScrollBar.vertical.policy: ScrollBar.AsNeeded
-                ScrollBar.horizontal.policy: ScrollBar.AlwaysOff
-
-                Column {
-                    id: chatHistory
-                    // Make width responsive to the ScrollView's available width
-                    width: chatScrollView.availableWidth
-                    spacing: 15
-
-                    property var messages: []
-
-                    function appendMessage(sender, message, isUser) {
-                        const messageData = {
-                            "sender": sender,
-                            "message": message,
-                            "isUser": isUser,
-                            "timestamp": new Date().toLocaleTimeString()
-                        }
+                spacing: 15
+                // Delegates exist only for the messages in view
+                model: ListModel { id: chatModel }
+                delegate: chatMessageComponent
+                ScrollBar.vertical: ScrollBar {
+                    policy: ScrollBar.AsNeeded
+                    onPressedChanged: chatHistory.followEnd = !pressed && chatHistory.atYEnd
+                }
 
-                        messages.push(messageData)
+                // Message ids and metadata of every session, keyed by session id
+                property var sessionMessages: ({})
+                property string sessionId: appController.sessionManager.activeSessionId
+
+                // Stay at the newest message while delegates are still growing
+                property bool followEnd: true
+                onMovementStarted: followEnd = false
+                onMovementEnded: followEnd = atYEnd
+                onContentHeightChanged: {
+                    if (followEnd) {
+                        positionViewAtEnd()
+                    }
+                }
 
-                        // Create and add new message component without explicit width
-                        const messageItem = chatMessageComponent.createObject(chatHistory, {
-                            "messageData": messageData
-                        })
+                // Page in older messages when scrolled to the top
+                onAtYBeginningChanged: {
+                    if (atYBeginning && !followEnd && contentHeight > height) {
+                        loadOlderMessages()
+                    }
+                }
+
+                function createMessageData(messageId, isUser, timestamp, offset) {
+                    return {
+                        "messageId": messageId,
+                        "offset": offset,  // Position in the session file, -1 if not loaded from it
+                        "sender": isUser ? "You" : "Assistant",
+                        "isUser": isUser,
+                        "timestamp": timestamp.toLocaleTimeString()
+                    }
+                }
 
-                        // Auto-scroll to bottom
-                        Qt.callLater(() => {
-                            chatScrollView.ScrollBar.vertical.position = 1.0 - chatScrollView.ScrollBar.vertical.size
-                        })
+                function fromStored(records) {
+                    return records.map(r => createMessageData(
+                        r.messageId, r.role === "user", new Date(r.timestamp), r.offset))
+                }
+
+                function ensureSession(targetSessionId) {
+                    // Sessions restored from storage start with their newest page only
+                    if (!sessionMessages[targetSessionId]) {
+                        sessionMessages[targetSessionId] = fromStored(
+                            appController.sessionManager.recentMessages(targetSessionId))
                     }
+                }
+
+                function appendMessage(targetSessionId, messageId, isUser) {
+                    const messageData = createMessageData(messageId, isUser, new Date(), -1)
 
-                    function clearMessages() {
-                        // Clear all child components
-                        for (let i = children.length - 1; i >= 0; i--) {
-                            children[i].destroy()
+                    ensureSession(targetSessionId)
+                    sessionMessages[targetSessionId].push(messageData)
+
+                    // Answers of background sessions are shown when their tab is opened
+                    if (targetSessionId === sessionId) {
+                        chatModel.append(messageData)
+                        scrollToBottom()
+                    }
+                }
+
+                function scrollToBottom() {
+                    followEnd = true
+                    Qt.callLater(() => chatHistory.positionViewAtEnd())
+                }
+
+                function showSession(targetSessionId) {
+                    ensureSession(targetSessionId)
+                    chatModel.clear()
+                    chatModel.append(sessionMessages[targetSessionId])
+                    scrollToBottom()
+                }
+
+                function loadOlderMessages() {
+                    if (!sessionMessages[sessionId]) {
+                        return
+                    }
+                    const older = fromStored(appController.sessionManager.olderMessages(sessionId))
+                    sessionMessages[sessionId] = older.concat(sessionMessages[sessionId])
+                    for (let i = older.length - 1; i >= 0; i--) {
+                        chatModel.insert(0, older[i])
+                    }
+                }
+
+                function dropSession(targetSessionId) {
+                    delete sessionMessages[targetSessionId]
+                    if (targetSessionId === sessionId) {
+                        chatModel.clear()
+                    }
+                }
+
+                function clearMessages() {
+                    chatModel.clear()
+                    sessionMessages[sessionId] = []
+                }
+            }
+        }
+
+        // Attached Documents
+        RowLayout {
+            Layout.fillWidth: true
+            spacing: 6
+            visible: appController.documents.length > 0 || appController.indexing
+
+            Text {
+                text: qsTr("Context:")
+                font.pixelSize: 12
+                color: root.textColor
+                opacity: 0.7
+            }
+
+            Repeater {
+                model: appController.documents
+
+                delegate: Rectangle {
+                    Layout.preferredHeight: 24
+                    Layout.preferredWidth: documentRow.implicitWidth + 16
+                    color: Qt.lighter(root.accentColor, 1.9)
+                    radius: 6
+                    border.color: Qt.lighter(root.accentColor, 1.5)
+                    border.width: 1
+
+                    ToolTip.visible: documentArea.containsMouse
+                    ToolTip.text: modelData
+
+                    MouseArea {
+                        id: documentArea
+                        anchors.fill: parent
+                        hoverEnabled: true
+                    }
+
+                    RowLayout {
+                        id: documentRow
+                        anchors.centerIn: parent
+                        spacing: 6
+
+                        Text {
+                            text: modelData.split(/[\\/]/).pop()
+                            font.pixelSize: 11
+                            color: root.textColor
+                        }
+
+                        Text {
+                            text: "✕"
+                            font.pixelSize: 9
+                            color: root.textColor
+                            opacity: detachArea.containsMouse ? 1.0 : 0.5
+
+                            MouseArea {
+                                id: detachArea
+                                anchors.fill: parent
+                                anchors.margins: -4
+                                hoverEnabled: true
+                                onClicked: appController.detachDocuments(modelData)
+                            }
                         }
-                        messages = []
                     }
                 }
             }
+
+            Text {
+                visible: appController.indexing
+                text: qsTr("Indexing…")
+                font.pixelSize: 11
+                color: root.warningColor
+            }
+
+            Item { Layout.fillWidth: true }
         }
 
         // Progress Bar
@@ -376,7 +619,6 @@ ApplicationWindow {
                             const userMessage = questionTextInput.text.trim()
                             if (userMessage.length > 0) {
                                 disableUserInterface()
-                                chatHistory.appendMessage("You", userMessage, true)
                                 appController.getQuestion(userMessage)
                                 questionTextInput.text = ""
                             }
@@ -412,6 +654,60 @@ ApplicationWindow {
                         }
                     }
 
+                    // Attach Documents Button
+                    Button {
+                        id: attachButton
+                        Layout.preferredWidth: 45
+                        Layout.preferredHeight: 45
+
+                        background: Rectangle {
+                            color: parent.enabled ?
+                                   (parent.hovered ? Qt.lighter(root.primaryColor, 1.5) : root.primaryColor) :
+                                   root.borderColor
+                            radius: 8
+                        }
+
+                        Text {
+                            anchors.centerIn: parent
+                            text: "📎"
+                            font.pixelSize: 16
+                        }
+
+                        ToolTip.visible: hovered
+                        ToolTip.text: qsTr("Attach Documents as Context")
+
+                        onClicked: attachMenu.popup()
+
+                        Menu {
+                            id: attachMenu
+                            MenuItem {
+                                text: qsTr("Attach files…")
+                                onTriggered: documentFileDialog.open()
+                            }
+                            MenuItem {
+                                text: qsTr("Attach folder…")
+                                onTriggered: documentFolderDialog.open()
+                            }
+                        }
+
+                        FileDialog {
+                            id: documentFileDialog
+                            title: qsTr("Attach files")
+                            fileMode: FileDialog.OpenFiles
+                            onAccepted: {
+                                for (let i = 0; i < selectedFiles.length; i++) {
+                                    appController.attachDocuments(selectedFiles[i].toString())
+                                }
+                            }
+                        }
+
+                        FolderDialog {
+                            id: documentFolderDialog
+                            title: qsTr("Attach folder")
+                            onAccepted: appController.attachDocuments(selectedFolder.toString())
+                        }
+                    }
+
                     // Play Voice Button
                     Button {
                         id: playVoice
@@ -1,4 +1,6 @@
 from .ai_service import AIService
 from .model_manager import ModelManager
+from .session import ChatSession
+from .session_manager import SessionManager
 
-__all__ = ['AIService', 'ModelManager']
+__all__ = ['AIService', 'ModelManager', 'ChatSession', 'SessionManager']
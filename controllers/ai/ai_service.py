@@ -1,11 +1,38 @@
 from typing import Dict, List, Tuple, Optional
+import os
 import requests
 from concurrent.futures import ThreadPoolExecutor
 from PySide6.QtCore import Signal
 
 from ..base import BaseController
 from .model_manager import ModelManager
+from .session import ChatSession
+from .session_manager import SessionManager
 from includes.network import make_request
+from includes import profiling
+from includes.retrieval import DocumentIndex
+from includes.storage import MessageStore, SessionStore
+
+
+# Upper bound of requests (of different sessions) running at the same time
+MAX_PARALLEL_REQUESTS = 4
+# Document excerpts injected into a question (count and size)
+CONTEXT_TOP_K = 6
+CONTEXT_TOKEN_BUDGET = 1500
+# Memory ceiling of the message texts in MiB (default: MessageStore's own)
+MESSAGE_MEMORY_ENV = "AI_ADVISOR_MESSAGE_MEMORY_MB"
+
+
+def _message_store_from_env() -> MessageStore:
+    """Create the MessageStore with the ceiling set in AI_ADVISOR_MESSAGE_MEMORY_MB"""
+    value = os.environ.get(MESSAGE_MEMORY_ENV, "")
+    try:
+        max_mb = float(value) if value else 0
+    except ValueError:
+        max_mb = 0
+    if max_mb <= 0:
+        return MessageStore()
+    return MessageStore(max_bytes=int(max_mb * 1024 * 1024))
 
 
 class AIService(BaseController):
@@ -17,39 +44,49 @@ class AIService(BaseController):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.model_manager = ModelManager(self)
-        self.conversation_history: List[Dict[str, str]] = []
-        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.message_store = _message_store_from_env()
+        self.session_manager = SessionManager(self.message_store, self, SessionStore())
+        self.executor = ThreadPoolExecutor(max_workers=MAX_PARALLEL_REQUESTS)
+        self.document_index = DocumentIndex()
+        self.index_executor = ThreadPoolExecutor(max_workers=1)
+        self.session_manager.sessionClosed.connect(self._drop_unused_documents)
+        
+        # Pick up changes made to attached documents while the app was closed
+        for root in self._attached_roots():
+            self.index_executor.submit(self.document_index.index_path, root)
     
-    def send_question(self, question: str) -> Tuple[str, str, Optional[int], Optional[str]]:
+    @profiling.span()
+    def send_question(self, question: str,
+                      session: Optional[ChatSession] = None) -> Tuple[str, str, Optional[int], Optional[str]]:
         """Send question to AI model and get response"""
-        if not self.model_manager.is_model_selected():
+        session = session or self.session_manager.active_session
+        if not self.model_manager.is_valid_model(session.model):
             return "No model is selected!", question, None, None
         
-        # Add user question to history
+        # Work on a snapshot; the history is only extended once the answer arrived
+        generation = session.generation
         user_message = {"role": "user", "content": question}
-        self.conversation_history.append(user_message)
         
         # Prepare payload
         payload = {
-            "model": self.model_manager.current_model,
-            "messages": self.conversation_history.copy()
+            "model": session.model,
+            "messages": self.session_manager.messages(session)
+                        + [self._with_document_context(session, user_message)]
         }
         
         try:
             provider_cfg, model_cfg = self.model_manager.get_provider_config(
-                self.model_manager.current_model
+                session.model
             )
             
             response = make_request(
-                provider_cfg, model_cfg, self.model_manager.current_model, payload
+                provider_cfg, model_cfg, session.model, payload
             )
             response.raise_for_status()
             
         except requests.exceptions.Timeout:
-            self.conversation_history.pop()  # Remove failed question
             return "Request timed out!", question, None, None
         except requests.exceptions.RequestException as e:
-            self.conversation_history.pop()
             try:
                 if hasattr(response, 'json') and 'error' in response.json():
                     error_msg = response.json()['error']['message']
@@ -59,19 +96,21 @@ class AIService(BaseController):
                 error_msg = f"A request error occurred: {e}"
             return error_msg, question, None, None
         except Exception as e:
-            self.conversation_history.pop()
             return self.handle_error(e, "AI service error"), question, None, None
         
-        return self._process_response(response, question)
+        return self._process_response(response, question, session, generation, user_message)
     
-    def _process_response(self, response: requests.Response, question: str) -> Tuple[str, str, Optional[int], Optional[str]]:
+    @profiling.span()
+    def _process_response(self, response: requests.Response, question: str,
+                          session: ChatSession, generation: int,
+                          user_message: Dict[str, str]) -> Tuple[str, str, Optional[int], Optional[str]]:
         """Process the API response based on provider type"""
         if response.status_code != 200:
-            self.conversation_history.pop()
             return f"Error code: {response.status_code}", question, None, None
         
         try:
-            json_data = response.json()
+            with profiling.region("decode JSON"):
+                json_data = response.json()
             
             # Handle different provider response formats
             if 'choices' in json_data:  # OpenAI/DeepSeek
@@ -92,33 +131,94 @@ class AIService(BaseController):
                 model = json_data.get('model', 'gemini')
                 
             elif 'error' in json_data:
-                self.conversation_history.pop()
                 return json_data['error']['message'], question, None, None
                 
             else:
-                self.conversation_history.pop()
                 return "Unknown response format", question, None, None
             
-            # Add assistant response to history
+            # Add the whole exchange to history
             assistant_message = {"role": "assistant", "content": content}
-            self.conversation_history.append(assistant_message)
+            self.session_manager.commit(
+                session, generation, tokens, user_message, assistant_message
+            )
             
             return content, question, tokens, model
             
         except Exception as e:
-            self.conversation_history.pop()
             return self.handle_error(e, "Failed to process response"), question, None, None
     
-    def send_question_async(self, question: str, callback):
-        """Send question asynchronously"""
-        future = self.executor.submit(self.send_question, question)
+    def _with_document_context(self, session: ChatSession,
+                               user_message: Dict[str, str]) -> Dict[str, str]:
+        """
+        Prefix the question with the most relevant excerpts of the session's
+        attached documents. Only this request carries them; the history keeps
+        the plain question, so later turns stay small.
+        """
+        if not session.documents:
+            return user_message
+        question = user_message["content"]
+        with profiling.region("retrieve document context"):
+            chunks = self.document_index.search(
+                question, session.documents, CONTEXT_TOP_K, CONTEXT_TOKEN_BUDGET
+            )
+        if not chunks:
+            return user_message
+        
+        excerpts = "\n\n".join(
+            f"--- {chunk.path} (lines {chunk.start_line}-{chunk.end_line}) ---\n{chunk.text}"
+            for chunk in chunks
+        )
+        content = (
+            "Relevant excerpts from my attached documents:\n\n"
+            f"{excerpts}\n\nQuestion:\n{question}"
+        )
+        return {"role": user_message["role"], "content": content}
+    
+    def send_question_async(self, question: str, callback,
+                            session: Optional[ChatSession] = None):
+        """Send question asynchronously; requests of different sessions run in parallel"""
+        session = session or self.session_manager.active_session
+        future = self.executor.submit(self.send_question, question, session)
         future.add_done_callback(callback)
         return future
     
-    def clear_conversation_history(self):
+    @property
+    def conversation_history(self) -> List[Dict[str, str]]:
+        """History of the active session"""
+        return self.session_manager.messages(self.session_manager.active_session)
+    
+    def clear_conversation_history(self, session: Optional[ChatSession] = None):
         """Clear the conversation history"""
-        self.conversation_history.clear()
+        self.session_manager.clear_session(session or self.session_manager.active_session)
     
-    def get_conversation_history(self) -> List[Dict[str, str]]:
+    def get_conversation_history(self, session: Optional[ChatSession] = None) -> List[Dict[str, str]]:
         """Get current conversation history"""
-        return self.conversation_history.copy()
+        return self.session_manager.messages(session or self.session_manager.active_session)
+    
+    def attach_documents(self, session: ChatSession, path: str, callback):
+        """Attach a file or folder to *session* and index it asynchronously"""
+        path = os.path.abspath(path)
+        if path not in session.documents:
+            self.session_manager.set_documents(session, session.documents + (path,))
+        future = self.index_executor.submit(self.document_index.index_path, path)
+        future.add_done_callback(callback)
+        return future
+    
+    def detach_documents(self, session: ChatSession, path: str):
+        """Detach a file or folder; its index is dropped once no session uses it"""
+        self.session_manager.set_documents(
+            session, tuple(p for p in session.documents if p != path)
+        )
+        self._drop_unused_documents([path])
+    
+    def _drop_unused_documents(self, paths: List[str]):
+        """Remove files and folders no open session uses from the index"""
+        attached = self._attached_roots()
+        for path in paths:
+            if path not in attached:
+                self.index_executor.submit(self.document_index.remove_root, path)
+    
+    def _attached_roots(self) -> set:
+        return {
+            root for s in self.session_manager.all_sessions() for root in s.documents
+        }
@@ -52,3 +52,7 @@ class ModelManager(BaseController):
     def is_model_selected(self) -> bool:
         """Check if a valid model is selected"""
         return self._model_index > 0
+    
+    def is_valid_model(self, model_name: str) -> bool:
+        """Check if *model_name* is a real model (not the dropdown placeholder)"""
+        return model_name in self.available_models[1:]
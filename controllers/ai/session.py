@@ -0,0 +1,70 @@
+from typing import Tuple
+import threading
+import uuid
+
+
+class ChatSession:
+    """
+    One independent conversation (a GUI tab).
+
+    The history is kept as an immutable tuple of MessageStore ids that is
+    swapped atomically under a lock, so worker threads can build payloads
+    from a snapshot while the GUI thread clears or reads the same session.
+    """
+
+    def __init__(self, title: str, model: str = "", session_id: str = ""):
+        self.session_id = session_id or uuid.uuid4().hex
+        self.title = title
+        self.model = model
+        self.num_tokens = 0
+        self.in_flight = False
+        self.loaded = False
+        self.older_offset = 0  # Storage offset of the next older page
+        self.last_answer_id = 0  # Newest answer, read out by "Play Response"
+        self.documents: Tuple[str, ...] = ()  # Attached files and folders
+        self._history: Tuple[int, ...] = ()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    @property
+    def generation(self) -> int:
+        """Incremented on every clear; used to drop answers of a stale history"""
+        return self._generation
+
+    def snapshot(self) -> Tuple[int, ...]:
+        """Return the message ids of the current (immutable) history"""
+        return self._history
+
+    def commit(self, generation: int, *message_ids: int) -> bool:
+        """
+        Append *message_ids* atomically, unless the history was cleared after
+        *generation* was read. Returns True if the messages were stored.
+        """
+        with self._lock:
+            if generation != self._generation:
+                return False
+            self._history = self._history + message_ids
+            return True
+
+    def forget(self, message_ids: set) -> Tuple[int, ...]:
+        """Remove *message_ids* from the history; returns the removed entries"""
+        with self._lock:
+            removed = tuple(i for i in self._history if i in message_ids)
+            self._history = tuple(i for i in self._history if i not in message_ids)
+            return removed
+
+    def restore(self, message_ids: Tuple[int, ...]):
+        """Replace the history with messages loaded from storage"""
+        with self._lock:
+            self._history = message_ids
+            self.loaded = True
+
+    def clear(self) -> Tuple[int, ...]:
+        """Drop the whole history; returns the removed entries"""
+        with self._lock:
+            removed = self._history
+            self._history = ()
+            self._generation += 1
+            self.num_tokens = 0
+            self.last_answer_id = 0
+            return removed
@@ -0,0 +1,301 @@
+from typing import Dict, List, Optional, Tuple
+import threading
+import time
+from PySide6.QtCore import Signal, Slot, Property
+
+from ..base import BaseController
+from .session import ChatSession
+from includes.storage import MessageStore, SessionStore
+
+# Messages loaded into the history when a stored session is resumed
+RECENT_WINDOW = 50
+# Messages handed to the GUI at once (initial view and each older page)
+PAGE_SIZE = 20
+
+
+class SessionManager(BaseController):
+    """Keeps the set of parallel chat sessions and tracks the active one"""
+
+    # Signals
+    sessionsChanged = Signal()
+    activeSessionChanged = Signal(str)
+    sessionBusyChanged = Signal(str, bool)  # session id, busy
+    sessionClosed = Signal(list)  # documents attached to the closed session
+
+    def __init__(self, message_store: MessageStore, parent=None,
+                 store: Optional[SessionStore] = None):
+        super().__init__(parent)
+        self.message_store = message_store
+        self._sessions: Dict[str, ChatSession] = {}
+        self._lock = threading.RLock()
+        self._counter = 0
+        self._active_id = ""
+        self._store = store
+        if not self._restore():
+            self.setActiveSession(self.createSession(""))
+
+    @property
+    def active_session(self) -> ChatSession:
+        """Get the session shown in the GUI"""
+        return self._sessions[self._active_id]
+
+    def get_session(self, session_id: str) -> Optional[ChatSession]:
+        """Get a session by id, or None if it was closed"""
+        return self._sessions.get(session_id)
+
+    def all_sessions(self) -> List[ChatSession]:
+        """Get all open sessions in creation order"""
+        return list(self._sessions.values())
+
+    def try_begin(self, session: ChatSession) -> bool:
+        """Reserve *session* for a request unless one is already in flight"""
+        with self._lock:
+            if session.in_flight:
+                return False
+            session.in_flight = True
+        self.sessionBusyChanged.emit(session.session_id, True)
+        return True
+
+    def finish(self, session: ChatSession):
+        """Mark the in-flight request of *session* as done"""
+        with self._lock:
+            session.in_flight = False
+        self.sessionBusyChanged.emit(session.session_id, False)
+
+    def commit(self, session: ChatSession, generation: int, tokens: int,
+               *messages: Dict[str, str]) -> bool:
+        """Add an answered exchange to *session* and persist it"""
+        # Pinned: the MessageStore must not drop what the model still needs
+        message_ids = tuple(
+            self.message_store.put(m["role"], m["content"], pin=True) for m in messages
+        )
+        with self._lock:
+            # A closed session's file is gone; a late answer must not recreate it
+            if (session.session_id not in self._sessions
+                    or not session.commit(generation, *message_ids)):
+                self.message_store.unpin(message_ids)
+                return False
+            session.num_tokens = tokens
+            if self._store is not None:
+                now = int(time.time() * 1000)
+                self._store.append(
+                    session.session_id, [dict(m, ts=now) for m in messages]
+                )
+                self._save_manifest()
+        return True
+
+    def messages(self, session: ChatSession) -> List[Dict[str, str]]:
+        """
+        History of *session* as API messages. History messages are pinned,
+        but should one be missing anyway its whole exchange is skipped, so
+        the model never gets a question without answer or vice versa.
+        """
+        messages: List[Dict[str, str]] = []
+        kept: List[int] = []
+        dropped = set()
+        for message_id in session.snapshot():
+            message = self.message_store.get(message_id)
+            if message is None:
+                dropped.add(message_id)
+                if messages and messages[-1]["role"] == "user":
+                    messages.pop()
+                    dropped.add(kept.pop())
+            elif message["role"] == "user" and messages and messages[-1]["role"] == "user":
+                # Unanswered question (e.g. its answer was torn on disk)
+                messages[-1] = message
+                dropped.add(kept[-1])
+                kept[-1] = message_id
+            elif message["role"] != "user" and (not messages or messages[-1]["role"] != "user"):
+                dropped.add(message_id)  # Answer without question
+            else:
+                messages.append(message)
+                kept.append(message_id)
+        if messages and messages[-1]["role"] == "user":
+            messages.pop()
+            dropped.add(kept.pop())
+        if dropped:
+            self.message_store.unpin(session.forget(dropped))
+        return messages
+
+    def clear_session(self, session: ChatSession):
+        """Drop the history of *session*, in memory and on disk"""
+        with self._lock:
+            self.message_store.unpin(session.clear())
+            session.older_offset = 0
+            if self._store is not None:
+                self._store.clear(session.session_id)
+                self._save_manifest()
+
+    def set_model(self, session: ChatSession, model: str):
+        """Remember the model selected for *session*"""
+        if session.model != model:
+            session.model = model
+            self._save_manifest()
+
+    def set_documents(self, session: ChatSession, documents: Tuple[str, ...]):
+        """Remember the files and folders attached to *session*"""
+        if session.documents != documents:
+            session.documents = documents
+            self._save_manifest()
+
+    def _restore(self) -> bool:
+        """Recreate the stored sessions; only the active one is loaded"""
+        if self._store is None:
+            return False
+        manifest = self._store.load_manifest()
+        for entry in manifest.get("sessions", []):
+            session = ChatSession(
+                entry.get("title", ""), entry.get("model", ""), entry["id"]
+            )
+            session.num_tokens = entry.get("num_tokens", 0)
+            session.documents = tuple(entry.get("documents", ()))
+            self._sessions[session.session_id] = session
+        if not self._sessions:
+            return False
+
+        self._counter = len(self._sessions)
+        active_id = manifest.get("active", "")
+        self._active_id = active_id if active_id in self._sessions else next(iter(self._sessions))
+        self._load(self.active_session)
+        return True
+
+    def _load(self, session: ChatSession):
+        """Load the recent window of a stored session into its history"""
+        if session.loaded or self._store is None:
+            return
+        records, _ = self._store.load_messages(session.session_id, RECENT_WINDOW)
+        # The window may start inside an exchange (e.g. torn lines took its
+        # place); the model's history has to start with a question
+        first = 0
+        while first < len(records) and records[first]["role"] != "user":
+            first += 1
+        records = records[first:]
+        message_ids = tuple(
+            self.message_store.put(r["role"], r["content"], pin=True) for r in records
+        )
+        session.restore(message_ids)
+        for record, message_id in zip(records, message_ids):
+            if record["role"] == "assistant":
+                session.last_answer_id = message_id
+
+    def _save_manifest(self):
+        if self._store is None:
+            return
+        with self._lock:
+            manifest = {
+                "active": self._active_id,
+                "sessions": [
+                    {
+                        "id": s.session_id,
+                        "title": s.title,
+                        "model": s.model,
+                        "num_tokens": s.num_tokens,
+                        "documents": list(s.documents),
+                    }
+                    for s in self._sessions.values()
+                ],
+            }
+            # Queued under the lock so manifests are written in the order they were built
+            self._store.save_manifest(manifest)
+
+    def _to_qml(self, records: List[Dict]) -> List[Dict]:
+        return [
+            {
+                # Display only (not pinned); evicted texts are reloaded by offset
+                "messageId": self.message_store.put(r["role"], r["content"]),
+                "role": r["role"],
+                "timestamp": r.get("ts", 0),
+                "offset": r["offset"],
+            }
+            for r in records
+        ]
+
+    # Slots for QML
+    @Slot(str, result=str)
+    def createSession(self, title: str) -> str:
+        """Open a new empty session and return its id"""
+        with self._lock:
+            self._counter += 1
+            session = ChatSession(title or f"Chat {self._counter}")
+            session.loaded = True
+            self._sessions[session.session_id] = session
+        self._save_manifest()
+        self.sessionsChanged.emit()
+        return session.session_id
+
+    @Slot(str)
+    def closeSession(self, session_id: str):
+        """Close a session; the last one is cleared instead of removed"""
+        with self._lock:
+            if session_id not in self._sessions:
+                return
+            if len(self._sessions) == 1:
+                self.clear_session(self._sessions[session_id])
+                return
+            ids = list(self._sessions)
+            position = ids.index(session_id)
+            session = self._sessions.pop(session_id)
+            self.message_store.unpin(session.clear())
+            if self._store is not None:
+                self._store.delete(session_id)
+        self._save_manifest()
+        self.sessionsChanged.emit()
+        self.sessionClosed.emit(list(session.documents))
+        if session_id == self._active_id:
+            ids.remove(session_id)
+            self.setActiveSession(ids[min(position, len(ids) - 1)])
+
+    @Slot(str)
+    def setActiveSession(self, session_id: str):
+        """Switch the GUI to another session"""
+        if session_id in self._sessions and session_id != self._active_id:
+            self._load(self._sessions[session_id])
+            self._active_id = session_id
+            self._save_manifest()
+            self.activeSessionChanged.emit(session_id)
+
+    @Slot(str, result=bool)
+    def isBusy(self, session_id: str) -> bool:
+        """Check whether a session has a request in flight"""
+        session = self._sessions.get(session_id)
+        return session is not None and session.in_flight
+
+    @Slot(str, result=list)
+    def recentMessages(self, session_id: str) -> List[Dict]:
+        """Newest page of stored messages, for display"""
+        session = self._sessions.get(session_id)
+        if session is None or self._store is None:
+            return []
+        records, session.older_offset = self._store.load_messages(session_id, PAGE_SIZE)
+        return self._to_qml(records)
+
+    @Slot(str, int, result=str)
+    def storedMessageText(self, session_id: str, offset: int) -> str:
+        """Text of the message stored at *offset* ("" if unknown), for evicted messages"""
+        if self._store is None or offset < 0 or session_id not in self._sessions:
+            return ""
+        record = self._store.load_message(session_id, offset)
+        return record.get("content", "") if record else ""
+
+    @Slot(str, result=list)
+    def olderMessages(self, session_id: str) -> List[Dict]:
+        """Next page of stored messages before the ones already displayed"""
+        session = self._sessions.get(session_id)
+        if session is None or self._store is None or session.older_offset <= 0:
+            return []
+        records, session.older_offset = self._store.load_messages(
+            session_id, PAGE_SIZE, session.older_offset
+        )
+        return self._to_qml(records)
+
+    # Properties
+    @Property(list, notify=sessionsChanged)
+    def sessions(self):
+        return [
+            {"id": s.session_id, "title": s.title}
+            for s in self.all_sessions()
+        ]
+
+    @Property(str, notify=activeSessionChanged)
+    def activeSessionId(self):
+        return self._active_id
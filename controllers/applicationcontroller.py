@@ -1,10 +1,13 @@
-from PySide6.QtCore import QObject, Slot, Signal, Property
+from PySide6.QtCore import QObject, Slot, Signal, Property, QUrl
 from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import threading
 
 from .base import BaseController
 from .ai import AIService
 from .media import MediaService
 from .utils import ChatLogger, ClipboardManager
+from includes import profiling
 
 
 class ApplicationController(BaseController):
@@ -12,10 +15,13 @@ class ApplicationController(BaseController):
 
     # Define signals
     postAnswer = Signal(str)
+    messageAdded = Signal(str, int, bool)  # session id, message id, is user
     postQuestion = Signal(str)
     postNumTokens = Signal(int)
     postModelIndex = Signal(int)
     postAvailableModels = Signal(list)
+    postDocuments = Signal(list)
+    postIndexing = Signal(bool)
     executionDone = Signal(bool)
     voiceProcessed = Signal()
 
@@ -29,40 +35,58 @@ class ApplicationController(BaseController):
         self.clipboard_manager = ClipboardManager()
 
         # Initialize properties - keep local copies for QML binding
-        self._answerText = ""
         self._questionText = ""
         self._numTokens = 0
         self._modelIndex = self.ai_service.model_manager.model_index
         self._availableModels = self.ai_service.model_manager.available_models
+        self._documents = []
+        self._indexing = False
+        self._index_jobs = 0
+        self._index_lock = threading.Lock()
 
         # Connect internal signals
         self._connect_signals()
 
+        # Show model and tokens of the session restored from storage
+        self._on_active_session_changed(self.ai_service.session_manager.activeSessionId)
+
     def _connect_signals(self):
         """Connect internal service signals"""
         self.postModelIndex.connect(self._on_model_index_changed)
         self.ai_service.model_manager.modelChanged.connect(self._on_model_changed)
+        self.ai_service.session_manager.activeSessionChanged.connect(self._on_active_session_changed)
 
     # Slots for external QML interface
     @Slot(str)
+    @profiling.span()
     def getQuestion(self, question: str):
         """Handle question from UI"""
-        self.executionDone.emit(False)
-        future = self.ai_service.send_question_async(question, self._on_answer_received)
+        session = self.ai_service.session_manager.active_session
+        if not self.ai_service.session_manager.try_begin(session):
+            return  # This session still waits for an answer
+        # Pinned until answered, so the history reuses the displayed id
+        question_id = self.ai_service.message_store.put("user", question, pin=True)
+        self.messageAdded.emit(session.session_id, question_id, True)
+        future = self.ai_service.send_question_async(
+            question, partial(self._on_answer_received, session, question_id), session
+        )
 
     @Slot()
+    @profiling.span()
     def convertVoiceToText(self):
         """Convert voice input to text"""
         self.executionDone.emit(False)
         future = self.media_service.process_voice_async(self._on_voice_converted)
 
     @Slot(str)
+    @profiling.span()
     def convertTextToVoice(self, text: str):
         """Convert text to speech"""
         self.executionDone.emit(False)
         future = self.media_service.process_speech_async(text, self._on_text_converted)
 
     @Slot(str)
+    @profiling.span()
     def setActiveModel(self, index_str: str):
         """Set active model by index"""
         try:
@@ -73,32 +97,93 @@ class ApplicationController(BaseController):
             self.handle_error(ValueError("Invalid model index"), "Model selection")
 
     @Slot(str)
+    @profiling.span()
     def resetHistory(self, message: str):
         """Reset conversation history"""
         self.ai_service.clear_conversation_history()
         self.logger.log_event(message)
 
     @Slot(str)
+    @profiling.span()
+    def attachDocuments(self, location: str):
+        """Attach a file or folder (path or file:// URL) to the active session"""
+        path = QUrl(location).toLocalFile() if location.startswith("file:") else location
+        if not path:
+            return
+        session = self.ai_service.session_manager.active_session
+        with self._index_lock:
+            self._index_jobs += 1
+        self.indexing = True
+        self.ai_service.attach_documents(session, path, self._on_documents_indexed)
+        self.documents = list(session.documents)
+
+    @Slot(str)
+    @profiling.span()
+    def detachDocuments(self, path: str):
+        """Detach a file or folder from the active session"""
+        session = self.ai_service.session_manager.active_session
+        self.ai_service.detach_documents(session, path)
+        self.documents = list(session.documents)
+
+    @Slot(str)
+    @profiling.span()
     def copyToClipboard(self, text: str):
         """Copy text to clipboard"""
         self.clipboard_manager.copy_to_clipboard(text)
 
+    @Slot(int, result=str)
+    @profiling.span()
+    def messageText(self, message_id: int) -> str:
+        """Text of a stored message ("" if it was dropped from memory)"""
+        return self.ai_service.message_store.get_content(message_id) or ""
+
+    @Slot()
+    def takeMemorySnapshot(self):
+        """Write a tracemalloc snapshot (profiling mode only)"""
+        path = profiling.snapshot_memory("requested from UI")
+        if path is not None:
+            print(f"Memory snapshot written to {path}")
+
     # Callback methods
-    def _on_answer_received(self, future):
-        """Handle AI response"""
+    @profiling.span()
+    def _on_answer_received(self, session, question_id, future):
+        """Handle AI response of *session*"""
         try:
             response, question, tokens, model = future.result()
-            self.answerText = response
 
             if tokens is not None and model is not None:
-                self.numTokens = tokens
-                self.logger.log_conversation(question, response, model, tokens)
+                if session is self.ai_service.session_manager.active_session:
+                    self.numTokens = tokens
+                self.logger.log_conversation(question, response, model, tokens, session.title)
 
         except Exception as e:
-            self.answerText = self.handle_error(e, "Failed to process AI response")
+            response = self.handle_error(e, "Failed to process AI response")
         finally:
-            self.executionDone.emit(True)
+            # Texts live in the shared MessageStore; each session keeps its own answer id
+            message_id = self.ai_service.message_store.put("assistant", response)
+            session.last_answer_id = message_id
+            # The tab may have been closed while the request was running
+            if self.ai_service.session_manager.get_session(session.session_id) is not None:
+                self.messageAdded.emit(session.session_id, message_id, False)
+            if session is self.ai_service.session_manager.active_session:
+                self.postAnswer.emit(response)
+            self.ai_service.message_store.unpin((question_id,))
+            self.ai_service.session_manager.finish(session)
+
+    @profiling.span()
+    def _on_documents_indexed(self, future):
+        """Handle the end of a background indexing job"""
+        try:
+            future.result()
+        except Exception as e:
+            self.handle_error(e, "Document indexing failed")
+        finally:
+            with self._index_lock:
+                self._index_jobs -= 1
+                pending = self._index_jobs > 0
+            self.indexing = pending
 
+    @profiling.span()
     def _on_voice_converted(self, future):
         """Handle voice-to-text conversion"""
         try:
@@ -110,6 +195,7 @@ class ApplicationController(BaseController):
         finally:
             self.executionDone.emit(True)
 
+    @profiling.span()
     def _on_text_converted(self, future):
         """Handle text-to-speech conversion"""
         try:
@@ -120,13 +206,18 @@ class ApplicationController(BaseController):
         finally:
             self.executionDone.emit(True)
 
+    @profiling.span()
     def _on_model_index_changed(self, index: int):
         """Handle model index change from postModelIndex signal"""
         # Update the service when the signal is emitted
         self.ai_service.model_manager.set_model_by_index(index)
 
+    @profiling.span()
     def _on_model_changed(self, model_name: str):
         """Handle model change from service"""
+        # The selected model belongs to the active session
+        session_manager = self.ai_service.session_manager
+        session_manager.set_model(session_manager.active_session, model_name)
         # Sync the local model index when service changes
         try:
             new_index = self._availableModels.index(model_name)
@@ -136,10 +227,27 @@ class ApplicationController(BaseController):
         except ValueError:
             pass  # Model name not found in list
 
+    @profiling.span()
+    def _on_active_session_changed(self, session_id: str):
+        """Show model and token count of the newly active session"""
+        session = self.ai_service.session_manager.active_session
+        try:
+            self.modelIndex = self._availableModels.index(session.model)
+        except ValueError:
+            self.modelIndex = 0
+        self.numTokens = session.num_tokens
+        self.documents = list(session.documents)
+        self.postAnswer.emit(self.answerText)
+
     # Properties
+    @Property(QObject, constant=True)
+    def sessionManager(self):
+        return self.ai_service.session_manager
+
     @Property(str, notify=postAnswer)
     def answerText(self):
-        return self._answerText
+        """Newest answer of the active session"""
+        return self.messageText(self.ai_service.session_manager.active_session.last_answer_id)
 
     @Property(str, notify=postQuestion)
     def questionText(self):
@@ -157,13 +265,15 @@ class ApplicationController(BaseController):
     def modelIndex(self):
         return self._modelIndex
 
-    # Setters - restored the missing setters
-    @answerText.setter
-    def answerText(self, value):
-        if self._answerText != value:
-            self._answerText = value
-            self.postAnswer.emit(value)
+    @Property(list, notify=postDocuments)
+    def documents(self):
+        return self._documents
+
+    @Property(bool, notify=postIndexing)
+    def indexing(self):
+        return self._indexing
 
+    # Setters - restored the missing setters
     @questionText.setter
     def questionText(self, value):
         if self._questionText != value:
@@ -187,3 +297,15 @@ class ApplicationController(BaseController):
         if self._modelIndex != value:
             self._modelIndex = value
             self.postModelIndex.emit(value)
+
+    @documents.setter
+    def documents(self, value):
+        if self._documents != value:
+            self._documents = value
+            self.postDocuments.emit(value)
+
+    @indexing.setter
+    def indexing(self, value):
+        if self._indexing != value:
+            self._indexing = value
+            self.postIndexing.emit(value)
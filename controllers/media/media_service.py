@@ -4,6 +4,7 @@ from PySide6.QtCore import Signal
 from ..base import BaseController
 from includes import speechToText as stt
 from includes import textToSpeech as tts
+from includes import profiling
 
 
 class MediaService(BaseController):
@@ -16,6 +17,7 @@ class MediaService(BaseController):
         super().__init__(parent)
         self.executor = ThreadPoolExecutor(max_workers=1)
     
+    @profiling.span()
     def convert_speech_to_text(self) -> str:
         """Convert speech input to text"""
         try:
@@ -25,6 +27,7 @@ class MediaService(BaseController):
         except Exception as e:
             return self.handle_error(e, "Speech to text conversion failed")
     
+    @profiling.span()
     def convert_text_to_speech(self, text: str):
         """Convert text to speech output"""
         try:
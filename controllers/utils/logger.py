@@ -1,12 +1,17 @@
 from pathlib import Path
+import threading
 from PySide6.QtCore import QDateTime, Qt
 
+from includes import profiling
+
 
 class ChatLogger:
     """Handles chat history logging"""
     
     def __init__(self, log_file: str = "log.txt"):
         self.log_file = log_file
+        # Answers of parallel sessions are logged from several threads
+        self._lock = threading.Lock()
         self._initialize_log()
     
     def _initialize_log(self):
@@ -19,15 +24,21 @@ class ChatLogger:
         with open(self.log_file, "a", encoding="utf-8") as f:
             f.write(f"********************* New Session {readable_date_time_str} *********************\n")
     
+    @profiling.span()
     def log_conversation(self, user_input: str, ai_response: str, 
-                        model_name: str, token_count: int):
+                        model_name: str, token_count: int, session_title: str = ""):
         """Log a complete conversation exchange"""
-        with open(self.log_file, "a", encoding="utf-8") as f:
-            f.write("* User:\n" + user_input + "\n\n")
-            f.write("* Advisor (" + model_name + ")" + ":\n" + ai_response + "\n\n")
-            f.write("* Total used tokens:\n" + str(token_count) + "\n---------------------------------------\n")
+        entry = (
+            ("* Session:\n" + session_title + "\n\n" if session_title else "")
+            + "* User:\n" + user_input + "\n\n"
+            + "* Advisor (" + model_name + ")" + ":\n" + ai_response + "\n\n"
+            + "* Total used tokens:\n" + str(token_count) + "\n---------------------------------------\n"
+        )
+        with self._lock, open(self.log_file, "a", encoding="utf-8") as f:
+            f.write(entry)
     
+    @profiling.span()
     def log_event(self, message: str):
         """Log a general event"""
-        with open(self.log_file, "a", encoding="utf-8") as f:
+        with self._lock, open(self.log_file, "a", encoding="utf-8") as f:
             f.write("\n" + message + "\n\n")
@@ -3,6 +3,7 @@ import re
 import requests
 
 from ..config.models import ProviderConfig, ModelConfig
+from .. import profiling
 
 
 def make_headers(provider: ProviderConfig, model_name: str) -> Dict[str, str]:
@@ -35,6 +36,7 @@ def make_headers(provider: ProviderConfig, model_name: str) -> Dict[str, str]:
     raise ValueError(f"Could not determine headers for model '{model_name}'")
 
 
+@profiling.span()
 def make_request(provider_cfg: ProviderConfig, model_cfg: ModelConfig, 
                 model_name: str, payload: dict) -> requests.Response:
     """
@@ -0,0 +1,8 @@
+from .profiler import (
+    Profiler, configure, enable, is_enabled, region, snapshot_memory, span,
+)
+
+__all__ = [
+    'Profiler', 'configure', 'enable', 'is_enabled', 'region',
+    'snapshot_memory', 'span',
+]
@@ -0,0 +1,306 @@
+from collections import Counter, defaultdict
+from contextlib import nullcontext
+from functools import wraps
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+PROFILE_ENV = "AI_ADVISOR_PROFILE"
+PROFILE_FLAG = "--profile"
+DEFAULT_OUTPUT = "profile.trace.json"
+
+# Seconds between two CPU stack samples
+SAMPLE_INTERVAL = 0.005
+# Rows per table of the text summary
+TOP_N = 25
+
+# Leaf frames in these modules mean "thread is waiting", not working
+_IDLE_MODULES = ("threading.py", "queue.py", "selectors.py")
+
+_profiler: Optional["Profiler"] = None
+
+
+class Profiler:
+    """
+    Collects timed spans and sampled CPU stacks of all Python threads.
+
+    The result is written as Chrome trace JSON (loadable in chrome://tracing,
+    Perfetto and speedscope) next to a plain-text top-N summary.
+    """
+
+    def __init__(self, output: str, interval: float = SAMPLE_INTERVAL):
+        self.output = Path(output)
+        self.interval = interval
+        self._start = time.perf_counter()
+        self._pid = os.getpid()
+        self._events: List[Dict] = []  # list.append is atomic, no lock needed
+        self._samples: List[Tuple[float, int, Tuple[str, ...]]] = []
+        self._snapshot_count = 0
+        self._last_snapshot: Optional[tracemalloc.Snapshot] = None
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(
+            target=self._sample_loop, name="profiler-sampler", daemon=True
+        )
+
+    def start(self):
+        self._sampler.start()
+
+    def _now_us(self) -> float:
+        return (time.perf_counter() - self._start) * 1e6
+
+    # Spans
+    def record(self, name: str, start_us: float, end_us: float):
+        self._events.append({
+            "name": name,
+            "cat": "span",
+            "ph": "X",
+            "ts": start_us,
+            "dur": end_us - start_us,
+            "pid": self._pid,
+            "tid": threading.get_ident(),
+        })
+
+    def region(self, name: str):
+        return _Region(self, name)
+
+    # CPU sampling
+    def _sample_loop(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            now = self._now_us()
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = self._stack_of(frame)
+                if stack:
+                    self._samples.append((now, thread_id, stack))
+
+    @staticmethod
+    def _stack_of(frame) -> Tuple[str, ...]:
+        """Root-first stack of *frame*; empty if the thread is idle"""
+        code = frame.f_code
+        if code.co_filename.endswith(_IDLE_MODULES) or code.co_name == "_worker":
+            return ()  # Waiting for work (executor workers block in _worker)
+        stack = []
+        while frame is not None:
+            # Keyed by function (its first line), not by the executing line,
+            # so all samples of one function add up in one row and node
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        # A lone module frame is the GUI thread blocked in the Qt event loop
+        if len(stack) == 1:
+            return ()
+        stack.reverse()
+        return tuple(stack)
+
+    # Memory
+    def snapshot_memory(self, label: str = "") -> Path:
+        """
+        Write the top allocation sites to <output>.mem-<n>.txt.
+
+        tracemalloc slows down every allocation, so it only starts with the
+        first snapshot (which serves as baseline); later snapshots also list
+        the growth since the previous one. Spans before that are unaffected.
+        """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self._snapshot_count += 1
+        snapshot = tracemalloc.take_snapshot()
+        stats = snapshot.statistics("lineno")
+        total = sum(stat.size for stat in stats)
+
+        path = self.output.with_name(f"{self.output.stem}.mem-{self._snapshot_count}.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(f"Memory snapshot {self._snapshot_count} {label}\n")
+            f.write(f"Traced total: {total / 1024:.1f} KiB\n\n")
+            for stat in stats[:TOP_N]:
+                f.write(f"{stat.size / 1024:10.1f} KiB {stat.count:8d} blocks  {stat.traceback}\n")
+
+            if self._last_snapshot is None:
+                f.write("\nAllocation tracing started with this snapshot\n")
+            else:
+                f.write(f"\nTop {TOP_N} growths since snapshot {self._snapshot_count - 1}\n")
+                for stat in snapshot.compare_to(self._last_snapshot, "lineno")[:TOP_N]:
+                    f.write(f"{stat.size_diff / 1024:+10.1f} KiB {stat.count_diff:+8d} blocks  "
+                            f"{stat.traceback}\n")
+        self._last_snapshot = snapshot
+
+        self._events.append({
+            "name": f"memory snapshot {self._snapshot_count} {label}".strip(),
+            "cat": "memory",
+            "ph": "i",
+            "s": "g",
+            "ts": self._now_us(),
+            "pid": self._pid,
+            "tid": threading.get_ident(),
+            "args": {"traced_kib": round(total / 1024, 1), "file": path.name},
+        })
+        return path
+
+    # Output
+    def finish(self):
+        """Stop sampling and write the trace and the summary"""
+        self._stop.set()
+        self._sampler.join()
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self._write_trace()
+        self._write_summary()
+
+    def _write_trace(self):
+        stack_frames: Dict[str, Dict] = {}
+        frame_ids: Dict[Tuple[Optional[str], str], str] = {}
+        samples = []
+        for ts, thread_id, stack in self._samples:
+            parent = None
+            for name in stack:
+                key = (parent, name)
+                frame_id = frame_ids.get(key)
+                if frame_id is None:
+                    frame_id = str(len(frame_ids))
+                    frame_ids[key] = frame_id
+                    stack_frames[frame_id] = {"name": name}
+                    if parent is not None:
+                        stack_frames[frame_id]["parent"] = parent
+                parent = frame_id
+            samples.append({
+                "cpu": 0, "tid": thread_id, "ts": ts, "sf": parent,
+                "name": "cpu", "weight": 1,
+            })
+
+        thread_names = [
+            {"name": "thread_name", "ph": "M", "pid": self._pid, "tid": t.ident,
+             "args": {"name": t.name}}
+            for t in threading.enumerate()
+        ]
+        with open(self.output, "w", encoding="utf-8") as f:
+            json.dump({
+                "traceEvents": thread_names + self._events,
+                "stackFrames": stack_frames,
+                "samples": samples,
+                "displayTimeUnit": "ms",
+            }, f)
+
+    def _write_summary(self):
+        spans = defaultdict(list)
+        for event in self._events:
+            if event["ph"] == "X":
+                spans[event["name"]].append(event["dur"] / 1000)
+
+        self_samples = Counter(stack[-1] for _, _, stack in self._samples)
+        total_samples = Counter()
+        for _, _, stack in self._samples:
+            total_samples.update(set(stack))
+        sample_ms = self.interval * 1000
+
+        path = self.output.with_name(f"{self.output.stem}.summary.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(f"Top {TOP_N} spans by total time\n")
+            f.write(f"{'total ms':>10} {'calls':>7} {'mean ms':>9} {'max ms':>9}  name\n")
+            rows = sorted(spans.items(), key=lambda item: sum(item[1]), reverse=True)
+            for name, durations in rows[:TOP_N]:
+                f.write(f"{sum(durations):10.1f} {len(durations):7d} "
+                        f"{sum(durations) / len(durations):9.2f} {max(durations):9.2f}  {name}\n")
+
+            f.write(f"\nTop {TOP_N} functions by sampled self time (~{sample_ms:g} ms per sample)\n")
+            for name, count in self_samples.most_common(TOP_N):
+                f.write(f"{count * sample_ms:10.1f} ms  {name}\n")
+
+            f.write(f"\nTop {TOP_N} functions by sampled total time\n")
+            for name, count in total_samples.most_common(TOP_N):
+                f.write(f"{count * sample_ms:10.1f} ms  {name}\n")
+
+
+class _Region:
+    """Context manager recording one span"""
+
+    __slots__ = ("_profiler", "_name", "_start")
+
+    def __init__(self, profiler: Profiler, name: str):
+        self._profiler = profiler
+        self._name = name
+
+    def __enter__(self):
+        self._start = self._profiler._now_us()
+        return self
+
+    def __exit__(self, *exc):
+        self._profiler.record(self._name, self._start, self._profiler._now_us())
+        return False
+
+
+def enable(output: str = DEFAULT_OUTPUT) -> Profiler:
+    """Start profiling; the results are written when the process exits"""
+    global _profiler
+    if _profiler is None:
+        _profiler = Profiler(output)
+        _profiler.start()
+        atexit.register(_profiler.finish)
+    return _profiler
+
+
+def configure(argv: List[str]) -> bool:
+    """
+    Enable profiling if requested by ``--profile[=<file>]`` in *argv* or the
+    AI_ADVISOR_PROFILE environment variable (its value is the output file).
+    Must run before the profiled modules are imported.
+    """
+    output = os.environ.get(PROFILE_ENV, "")
+    requested = bool(output)
+    for arg in list(argv):
+        if arg == PROFILE_FLAG or arg.startswith(PROFILE_FLAG + "="):
+            requested = True
+            output = arg.partition("=")[2] or output
+            argv.remove(arg)
+    if requested:
+        enable(output if output and output != "1" else DEFAULT_OUTPUT)
+    return requested
+
+
+def is_enabled() -> bool:
+    return _profiler is not None
+
+
+def span(name: str = ""):
+    """
+    Decorator recording every call as a span. When profiling is disabled at
+    import time the function is returned unchanged, so it costs nothing.
+    """
+    def decorator(func):
+        if _profiler is None:
+            return func
+        label = name or func.__qualname__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = _profiler._now_us()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _profiler.record(label, start, _profiler._now_us())
+        return wrapper
+    return decorator
+
+
+_NO_REGION = nullcontext()
+
+
+def region(name: str):
+    """Context manager recording a span around a block (no-op when disabled)"""
+    if _profiler is None:
+        return _NO_REGION
+    return _profiler.region(name)
+
+
+def snapshot_memory(label: str = "") -> Optional[Path]:
+    """Write a tracemalloc snapshot now; returns its file or None when disabled"""
+    if _profiler is None:
+        return None
+    return _profiler.snapshot_memory(label)
@@ -0,0 +1,3 @@
+from .document_index import Chunk, DocumentIndex, estimate_tokens
+
+__all__ = ['Chunk', 'DocumentIndex', 'estimate_tokens']
@@ -0,0 +1,362 @@
+from collections import Counter
+from dataclasses import dataclass
+from typing import Iterator, List, Sequence, Tuple
+import math
+import os
+import re
+import sqlite3
+import threading
+
+# Chunking: a chunk ends after this many characters or lines
+CHUNK_CHARS = 1500
+CHUNK_LINES = 60
+# Files larger than this are not indexed
+MAX_FILE_BYTES = 5 * 1024 * 1024
+# Unchanged files whose scan mark is written in one transaction
+SCAN_BATCH = 1000
+SKIPPED_DIRS = {
+    ".git", ".hg", ".svn", "__pycache__", "node_modules", ".venv", "venv",
+    ".idea", ".vscode", "build", "dist", ".mypy_cache", ".pytest_cache",
+}
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_TOKEN_RE = re.compile(r"[A-Z]?[a-z]+|[A-Z]+(?![a-z])|\d+")
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "how",
+    "in", "is", "it", "of", "on", "or", "that", "the", "this", "to", "was",
+    "what", "when", "where", "which", "why", "with", "you", "can", "do",
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS roots (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    chunk_count INTEGER NOT NULL DEFAULT 0,
+    total_length INTEGER NOT NULL DEFAULT 0,
+    scan INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    root_id INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    scan INTEGER NOT NULL,
+    UNIQUE (root_id, path)
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    id INTEGER PRIMARY KEY,
+    file_id INTEGER NOT NULL,
+    start_line INTEGER NOT NULL,
+    end_line INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS chunks_file ON chunks (file_id);
+-- Root and chunk length are copied into the postings so that scoring a
+-- term is a single range scan of this table
+CREATE TABLE IF NOT EXISTS postings (
+    term TEXT NOT NULL,
+    root_id INTEGER NOT NULL,
+    chunk_id INTEGER NOT NULL,
+    tf INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    PRIMARY KEY (term, root_id, chunk_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_chunk ON postings (chunk_id);
+"""
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-case terms; identifiers are split at camelCase/snake_case borders"""
+    return [
+        token for token in (t.lower() for t in _TOKEN_RE.findall(text))
+        if len(token) > 1 and token not in _STOPWORDS
+    ]
+
+
+def _outermost(roots: Sequence[str]) -> List[str]:
+    """Drop roots inside another root; their files are indexed there as well"""
+    kept: List[str] = []
+    for root in sorted(set(roots)):
+        if not any(root == k or root.startswith(k.rstrip(os.sep) + os.sep) for k in kept):
+            kept.append(root)
+    return kept
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough model-token count (about four characters per token)"""
+    return len(text) // 4 + 1
+
+
+@dataclass(frozen=True)
+class Chunk:
+    """A scored excerpt of an attached document"""
+    path: str
+    start_line: int
+    end_line: int
+    text: str
+    score: float
+
+
+class DocumentIndex:
+    """
+    Incremental on-disk BM25 index of the documents attached by the user.
+
+    Files are split into line-based chunks; each chunk's term frequencies are
+    stored as postings in SQLite. Re-indexing a root only touches files whose
+    size or mtime changed and forgets files that disappeared. Files are
+    streamed chunk by chunk, so memory use does not depend on the tree size.
+    """
+
+    def __init__(self, db_file: str = "documents.db"):
+        self._conn = sqlite3.connect(db_file, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    # Indexing
+    def index_path(self, root: str) -> int:
+        """(Re-)index a file or folder; returns the number of changed files"""
+        root = os.path.abspath(root)
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR IGNORE INTO roots (path) VALUES (?)", (root,))
+            self._conn.execute("UPDATE roots SET scan = scan + 1 WHERE path = ?", (root,))
+            root_id, scan = self._conn.execute(
+                "SELECT id, scan FROM roots WHERE path = ?", (root,)
+            ).fetchone()
+
+        changed = 0
+        unchanged: List[int] = []
+        for path, stat in self._walk(root):
+            file_id = self._unchanged_file(root_id, path, stat)
+            if file_id is None:
+                self._index_file(root_id, path, stat, scan)
+                changed += 1
+                continue
+            unchanged.append(file_id)
+            if len(unchanged) >= SCAN_BATCH:
+                self._mark_scanned(unchanged, scan)
+                unchanged = []
+        self._mark_scanned(unchanged, scan)
+
+        # Files not seen in this scan were deleted or moved
+        with self._lock, self._conn:
+            stale = self._conn.execute(
+                "SELECT id FROM files WHERE root_id = ? AND scan != ?", (root_id, scan)
+            ).fetchall()
+            for (file_id,) in stale:
+                self._delete_file(root_id, file_id)
+        return changed + len(stale)
+
+    def remove_root(self, root: str):
+        """Forget a file or folder and all of its chunks"""
+        root = os.path.abspath(root)
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT id FROM roots WHERE path = ?", (root,)).fetchone()
+            if row is None:
+                return
+            file_ids = self._conn.execute(
+                "SELECT id FROM files WHERE root_id = ?", (row[0],)
+            ).fetchall()
+            for (file_id,) in file_ids:
+                self._delete_file(row[0], file_id)
+            self._conn.execute("DELETE FROM roots WHERE id = ?", (row[0],))
+
+    @staticmethod
+    def _walk(root: str) -> Iterator[Tuple[str, os.stat_result]]:
+        if os.path.isfile(root):
+            yield root, os.stat(root)
+            return
+        for directory, dirs, files in os.walk(root):
+            dirs[:] = [d for d in dirs if d not in SKIPPED_DIRS]
+            for name in files:
+                path = os.path.join(directory, name)
+                try:
+                    yield path, os.stat(path)
+                except OSError:
+                    continue
+
+    def _unchanged_file(self, root_id: int, path: str, stat: os.stat_result):
+        """Id of the indexed file at *path* if its size and mtime still match"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, mtime_ns, size FROM files WHERE root_id = ? AND path = ?",
+                (root_id, path),
+            ).fetchone()
+        if row is not None and row[1:] == (stat.st_mtime_ns, stat.st_size):
+            return row[0]
+        return None
+
+    def _mark_scanned(self, file_ids: List[int], scan: int):
+        """Record that unchanged files were seen, in one transaction"""
+        if not file_ids:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE files SET scan = ? WHERE id = ?", ((scan, i) for i in file_ids)
+            )
+
+    def _index_file(self, root_id: int, path: str, stat: os.stat_result, scan: int):
+        """(Re-)chunk one new or changed file in its own transaction"""
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT id FROM files WHERE root_id = ? AND path = ?", (root_id, path)
+            ).fetchone()
+            if row is not None:
+                self._delete_file(root_id, row[0])
+
+            file_id = self._conn.execute(
+                "INSERT INTO files (root_id, path, mtime_ns, size, scan) VALUES (?, ?, ?, ?, ?)",
+                (root_id, path, stat.st_mtime_ns, stat.st_size, scan),
+            ).lastrowid
+            if stat.st_size > MAX_FILE_BYTES or not self._is_text(path):
+                return
+
+            chunk_count = total_length = 0
+            for start_line, end_line, text in self._chunks(path):
+                terms = Counter(tokenize(text))
+                length = sum(terms.values())
+                chunk_id = self._conn.execute(
+                    "INSERT INTO chunks (file_id, start_line, end_line, length, text) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (file_id, start_line, end_line, length, text),
+                ).lastrowid
+                self._conn.executemany(
+                    "INSERT INTO postings (term, root_id, chunk_id, tf, length) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    ((term, root_id, chunk_id, tf, length) for term, tf in terms.items()),
+                )
+                chunk_count += 1
+                total_length += length
+            self._update_root_stats(root_id, chunk_count, total_length)
+
+    def _delete_file(self, root_id: int, file_id: int):
+        """Remove a file and its chunks; caller holds the lock and transaction"""
+        count, total = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(length), 0) FROM chunks WHERE file_id = ?",
+            (file_id,),
+        ).fetchone()
+        self._conn.execute(
+            "DELETE FROM postings WHERE chunk_id IN (SELECT id FROM chunks WHERE file_id = ?)",
+            (file_id,),
+        )
+        self._conn.execute("DELETE FROM chunks WHERE file_id = ?", (file_id,))
+        self._conn.execute("DELETE FROM files WHERE id = ?", (file_id,))
+        self._update_root_stats(root_id, -count, -total)
+
+    def _update_root_stats(self, root_id: int, chunk_count: int, total_length: int):
+        self._conn.execute(
+            "UPDATE roots SET chunk_count = chunk_count + ?, total_length = total_length + ? "
+            "WHERE id = ?",
+            (chunk_count, total_length, root_id),
+        )
+
+    @staticmethod
+    def _is_text(path: str) -> bool:
+        try:
+            with open(path, "rb") as f:
+                return b"\0" not in f.read(1024)
+        except OSError:
+            return False
+
+    @staticmethod
+    def _chunks(path: str) -> Iterator[Tuple[int, int, str]]:
+        """Yield (start_line, end_line, text) while reading the file line by line"""
+        lines: List[str] = []
+        size = 0
+        start = 1
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            for number, line in enumerate(f, 1):
+                lines.append(line)
+                size += len(line)
+                if size >= CHUNK_CHARS or len(lines) >= CHUNK_LINES:
+                    yield start, number, "".join(lines)
+                    lines, size, start = [], 0, number + 1
+        if lines and "".join(lines).strip():
+            yield start, start + len(lines) - 1, "".join(lines)
+
+    # Retrieval
+    def search(self, query: str, roots: Sequence[str], top_k: int,
+               token_budget: int) -> List[Chunk]:
+        """
+        Return up to *top_k* chunks of *roots* ranked by BM25 for *query*,
+        keeping their estimated size within *token_budget* tokens.
+        """
+        terms = set(tokenize(query))
+        roots = [os.path.abspath(root) for root in roots]
+        if not terms or not roots:
+            return []
+
+        marks = ", ".join("?" * len(roots))
+        with self._lock:
+            indexed = dict(self._conn.execute(
+                f"SELECT path, id FROM roots WHERE path IN ({marks})", roots
+            ).fetchall())
+            # Overlapping roots (a folder and a subfolder of it) would return
+            # each chunk once per root and skew the statistics
+            roots = _outermost(list(indexed))
+            root_ids = [indexed[root] for root in roots]
+            if not root_ids:
+                return []
+            marks = ", ".join("?" * len(roots))
+            chunk_count, total_length = self._conn.execute(
+                f"SELECT COALESCE(SUM(chunk_count), 0), COALESCE(SUM(total_length), 0) "
+                f"FROM roots WHERE path IN ({marks})",
+                roots,
+            ).fetchone()
+            if chunk_count == 0:
+                return []
+            average_length = total_length / chunk_count
+            id_marks = ", ".join("?" * len(root_ids))
+
+            # One scored sub-select per term; SQLite sums and ranks them
+            parts, params = [], []
+            for term in terms:
+                df = self._conn.execute(
+                    f"SELECT COUNT(*) FROM postings WHERE term = ? AND root_id IN ({id_marks})",
+                    (term, *root_ids),
+                ).fetchone()[0]
+                if df == 0:
+                    continue
+                idf = math.log(1 + (chunk_count - df + 0.5) / (df + 0.5))
+                parts.append(
+                    "SELECT chunk_id, ? * tf / (tf + ? + ? * length) AS score "
+                    f"FROM postings WHERE term = ? AND root_id IN ({id_marks})"
+                )
+                params += [
+                    idf * (BM25_K1 + 1),
+                    BM25_K1 * (1 - BM25_B),
+                    BM25_K1 * BM25_B / average_length,
+                    term, *root_ids,
+                ]
+            if not parts:
+                return []
+
+            ranked = self._conn.execute(
+                "SELECT r.total, f.path, c.start_line, c.end_line, c.text FROM ("
+                "SELECT chunk_id, SUM(score) AS total "
+                f"FROM ({' UNION ALL '.join(parts)}) "
+                "GROUP BY chunk_id ORDER BY total DESC LIMIT ?"
+                ") r JOIN chunks c ON c.id = r.chunk_id JOIN files f ON f.id = c.file_id "
+                "ORDER BY r.total DESC",
+                (*params, top_k * 4),
+            )
+
+            chunks = []
+            budget = token_budget
+            for score, path, start_line, end_line, text in ranked:
+                cost = estimate_tokens(text)
+                if cost > budget:
+                    continue
+                budget -= cost
+                chunks.append(Chunk(path, start_line, end_line, text, score))
+                if len(chunks) == top_k:
+                    break
+        return chunks
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,4 @@
+from .message_store import MessageStore
+from .session_store import SessionStore
+
+__all__ = ['MessageStore', 'SessionStore']
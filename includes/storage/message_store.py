@@ -0,0 +1,153 @@
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+import sys
+import threading
+import zlib
+
+# Default memory budget of all message texts
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+# Part of the budget kept uncompressed (most recently used messages)
+DEFAULT_HOT_BYTES = 8 * 1024 * 1024
+# Rough per-entry bookkeeping cost of a compressed message
+_COLD_OVERHEAD = 100
+
+
+class MessageStore:
+    """
+    Single owner of every message text in the application.
+
+    Sessions, the controller and QML only keep integer message ids;
+    identical role/content pairs share one id. Recently used messages stay
+    as plain strings, older ones are zlib-compressed in memory. When the
+    total exceeds *max_bytes* the oldest compressed messages are dropped –
+    they are still available from the session files on disk.
+
+    Messages that are pinned (the histories sent to the model) are never
+    dropped, only compressed, so the ceiling limits the display-only rest.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES,
+                 hot_bytes: int = DEFAULT_HOT_BYTES):
+        self.max_bytes = max_bytes
+        self.hot_bytes = min(hot_bytes, max_bytes)
+        self._lock = threading.Lock()
+        self._next_id = 1
+        self._keys: Dict[int, Tuple[str, int]] = {}  # id → (role, content hash)
+        self._index: Dict[Tuple[str, int], int] = {}
+        self._pins: Dict[int, int] = {}  # id → number of histories using it
+        self._hot: "OrderedDict[int, str]" = OrderedDict()
+        self._cold: "OrderedDict[int, bytes]" = OrderedDict()  # May be dropped
+        self._pinned_cold: Dict[int, bytes] = {}
+        self._hot_size = 0
+        self._cold_size = 0
+
+    def put(self, role: str, content: str, pin: bool = False) -> int:
+        """Store a message and return its id; *pin* also pins it once"""
+        role = sys.intern(role)
+        key = (role, hash(content))
+        with self._lock:
+            message_id = self._index.get(key)
+            if message_id is None or not self._promote(message_id, content):
+                message_id = self._next_id
+                self._next_id += 1
+                self._keys[message_id] = key
+                self._index[key] = message_id
+                self._hot[message_id] = content
+                self._hot_size += sys.getsizeof(content)
+            if pin:
+                self._pin(message_id)
+            self._enforce_limits()
+            return message_id
+
+    def pin(self, message_ids: Iterable[int]):
+        """Keep messages in memory until they are unpinned as often"""
+        with self._lock:
+            for message_id in message_ids:
+                self._pin(message_id)
+
+    def unpin(self, message_ids: Iterable[int]):
+        """Release pins taken by put(pin=True) or pin()"""
+        with self._lock:
+            for message_id in message_ids:
+                count = self._pins.get(message_id, 0) - 1
+                if count > 0:
+                    self._pins[message_id] = count
+                    continue
+                self._pins.pop(message_id, None)
+                blob = self._pinned_cold.pop(message_id, None)
+                if blob is not None:
+                    self._cold[message_id] = blob
+            self._enforce_limits()
+
+    def get_content(self, message_id: int) -> Optional[str]:
+        """Get the text of a message, or None if it was dropped"""
+        with self._lock:
+            content = self._hot.get(message_id)
+            if content is not None:
+                self._hot.move_to_end(message_id)
+                return content
+            blob = self._cold.get(message_id) or self._pinned_cold.get(message_id)
+        if blob is None:
+            return None
+        # Not promoted: scrolling through old messages must not grow memory
+        return zlib.decompress(blob).decode("utf-8")
+
+    def get(self, message_id: int) -> Optional[Dict[str, str]]:
+        """Get a message as API dict ({"role", "content"}), or None if dropped"""
+        key = self._keys.get(message_id)
+        content = self.get_content(message_id)
+        if key is None or content is None:
+            return None
+        return {"role": key[0], "content": content}
+
+    def memory_usage(self) -> int:
+        """Approximate number of bytes held by message texts"""
+        return self._hot_size + self._cold_size
+
+    def __len__(self) -> int:
+        return len(self._hot) + len(self._cold) + len(self._pinned_cold)
+
+    def _pin(self, message_id: int):
+        if message_id not in self._keys:
+            return  # Already dropped
+        self._pins[message_id] = self._pins.get(message_id, 0) + 1
+        blob = self._cold.pop(message_id, None)
+        if blob is not None:
+            self._pinned_cold[message_id] = blob
+
+    def _promote(self, message_id: int, content: str) -> bool:
+        """Mark a stored message as recently used; False on a hash collision"""
+        stored = self._hot.get(message_id)
+        if stored is not None:
+            if stored != content:
+                return False
+            self._hot.move_to_end(message_id)
+            return True
+
+        cold = self._cold if message_id in self._cold else self._pinned_cold
+        blob = cold[message_id]
+        if zlib.decompress(blob).decode("utf-8") != content:
+            return False
+        del cold[message_id]
+        self._cold_size -= len(blob) + _COLD_OVERHEAD
+        self._hot[message_id] = content
+        self._hot_size += sys.getsizeof(content)
+        return True
+
+    def _enforce_limits(self):
+        # Compress the least recently used messages ...
+        while self._hot_size > self.hot_bytes and len(self._hot) > 1:
+            message_id, content = self._hot.popitem(last=False)
+            self._hot_size -= sys.getsizeof(content)
+            blob = zlib.compress(content.encode("utf-8"))
+            cold = self._pinned_cold if message_id in self._pins else self._cold
+            cold[message_id] = blob
+            self._cold_size += len(blob) + _COLD_OVERHEAD
+
+        # ... and drop the oldest unpinned compressed ones above the ceiling
+        while self._hot_size + self._cold_size > self.max_bytes and self._cold:
+            message_id, blob = self._cold.popitem(last=False)
+            key = self._keys.pop(message_id)
+            if self._index.get(key) == message_id:
+                del self._index[key]
+            self._cold_size -= len(blob) + _COLD_OVERHEAD
@@ -0,0 +1,175 @@
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+
+# Bytes read per step when scanning a session file backwards
+_READ_BLOCK = 64 * 1024
+
+
+def read_lines_backwards(path: Path, end: int,
+                         count: int) -> Tuple[List[Tuple[int, bytes]], int]:
+    """
+    Return up to *count* non-empty lines that end before byte *end* of *path*
+    as (offset, line) pairs, oldest first, and the byte offset of the first
+    returned line.
+
+    Only the tail of the file is touched, so the cost depends on *count*
+    and not on the file size.
+    """
+    lines: List[Tuple[int, bytes]] = []
+    start = end
+    with open(path, "rb") as f:
+        pos = end
+        head = b""  # Bytes before the first newline seen so far
+        while pos > 0 and len(lines) < count:
+            step = min(_READ_BLOCK, pos)
+            pos -= step
+            f.seek(pos)
+            buffer = f.read(step) + head
+            parts = buffer.split(b"\n")
+            head = parts[0]
+            # Everything after the first newline is made of complete lines
+            offset = pos + len(buffer)
+            for part in reversed(parts[1:]):
+                line_start = offset - len(part)
+                offset = line_start - 1
+                if part and len(lines) < count:
+                    lines.append((line_start, part))
+                    start = line_start
+        if pos == 0 and head and len(lines) < count:
+            lines.append((0, head))
+            start = 0
+
+    lines.reverse()
+    return lines, start
+
+
+class SessionStore:
+    """
+    Durable, append-only storage of chat sessions.
+
+        <directory>/manifest.json   → session list, titles, models, active id
+        <directory>/<id>.jsonl      → one message per line, oldest first
+
+    Writes are queued to a single background thread (so their order is kept)
+    and fsync'ed; a line torn by a crash is skipped when reading.
+    """
+
+    def __init__(self, directory: str = "sessions"):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.manifest_file = self.directory / "manifest.json"
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+    def _session_file(self, session_id: str) -> Path:
+        return self.directory / f"{session_id}.jsonl"
+
+    # Reading (caller thread)
+    def load_manifest(self) -> Dict:
+        """Return the stored manifest or an empty one"""
+        try:
+            with open(self.manifest_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"active": "", "sessions": []}
+
+    def load_messages(self, session_id: str, count: int,
+                      before: Optional[int] = None) -> Tuple[List[Dict], int]:
+        """
+        Load up to *count* messages stored before byte offset *before*
+        (default: end of file). Returns the messages and the offset to pass
+        as *before* to fetch the next older page. Each message carries its
+        own byte offset in "offset", for load_message().
+        """
+        path = self._session_file(session_id)
+        try:
+            end = path.stat().st_size if before is None else before
+        except OSError:
+            return [], 0
+
+        raw_lines, start = read_lines_backwards(path, end, count)
+        messages = []
+        for offset, line in raw_lines:
+            try:
+                message = json.loads(line)
+            except ValueError:
+                continue  # Torn or empty line
+            message["offset"] = offset
+            messages.append(message)
+        return messages, start
+
+    def load_message(self, session_id: str, offset: int) -> Optional[Dict]:
+        """Load the single message stored at byte *offset*, or None"""
+        try:
+            with open(self._session_file(session_id), "rb") as f:
+                f.seek(offset)
+                return json.loads(f.readline())
+        except (OSError, ValueError):
+            return None
+
+    # Writing (background thread)
+    def append(self, session_id: str, records: List[Dict]):
+        """Append *records* to the session file"""
+        self._submit(self._append, self._session_file(session_id), records)
+
+    def clear(self, session_id: str):
+        """Drop all messages of a session"""
+        self._submit(self._truncate, self._session_file(session_id))
+
+    def delete(self, session_id: str):
+        """Remove a session file"""
+        self._submit(self._delete, self._session_file(session_id))
+
+    def save_manifest(self, manifest: Dict):
+        """Atomically replace the manifest"""
+        self._submit(self._write_manifest, manifest)
+
+    def close(self):
+        """Wait for all queued writes"""
+        self.executor.shutdown(wait=True)
+
+    def _submit(self, fn, *args):
+        future = self.executor.submit(fn, *args)
+        future.add_done_callback(self._report_error)
+
+    @staticmethod
+    def _report_error(future):
+        if future.exception() is not None:
+            print(f"Error - Session storage: {future.exception()}")
+
+    @staticmethod
+    def _append(path: Path, records: List[Dict]):
+        data = "".join(
+            json.dumps(record, ensure_ascii=False) + "\n" for record in records
+        ).encode("utf-8")
+        with open(path, "ab+") as f:
+            # Start on a fresh line if the previous write was torn
+            if f.tell() > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    data = b"\n" + data
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+    @staticmethod
+    def _truncate(path: Path):
+        with open(path, "wb") as f:
+            os.fsync(f.fileno())
+
+    @staticmethod
+    def _delete(path: Path):
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+
+    def _write_manifest(self, manifest: Dict):
+        tmp_file = self.manifest_file.with_suffix(".tmp")
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.manifest_file)
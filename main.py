@@ -8,6 +8,11 @@ from PySide6.QtQml import QQmlApplicationEngine
 
 if __name__ == "__main__":
 
+    # Opt-in profiling (--profile[=file] or AI_ADVISOR_PROFILE); must be
+    # configured before the controllers are imported
+    from includes import profiling
+    profiling.configure(sys.argv)
+
     current_dir = os.path.dirname(os.path.abspath(__file__))
     app_icon_path = os.path.join(current_dir, 'icons', 'brain.png')
     app = QApplication(sys.argv)
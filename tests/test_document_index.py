@@ -0,0 +1,102 @@
+import os
+
+import pytest
+
+from includes.retrieval import DocumentIndex
+from includes.retrieval.document_index import estimate_tokens
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = DocumentIndex(str(tmp_path / "documents.db"))
+    yield index
+    index.close()
+
+
+@pytest.fixture
+def docs(tmp_path):
+    root = tmp_path / "docs"
+    (root / "sub").mkdir(parents=True)
+    (root / "a.md").write_text("The session manager restores sessions.\n", encoding="utf-8")
+    (root / "b.md").write_text("Profiling spans and samples.\n", encoding="utf-8")
+    (root / "sub" / "c.md").write_text("Session files are append only.\n", encoding="utf-8")
+    return root
+
+
+def paths(chunks):
+    return [os.path.basename(chunk.path) for chunk in chunks]
+
+
+def test_unchanged_rescan_changes_nothing(index, docs):
+    assert index.index_path(str(docs)) == 3
+    assert index.index_path(str(docs)) == 0
+
+
+def test_changed_files_are_reindexed(index, docs):
+    index.index_path(str(docs))
+    (docs / "b.md").write_text("Tracemalloc snapshots on demand.\n", encoding="utf-8")
+    os.utime(docs / "b.md", ns=(0, 0))
+
+    assert index.index_path(str(docs)) == 1
+    assert paths(index.search("tracemalloc", [str(docs)], 5, 1000)) == ["b.md"]
+    assert index.search("profiling", [str(docs)], 5, 1000) == []
+
+
+def test_deleted_files_are_purged(index, docs):
+    index.index_path(str(docs))
+    (docs / "sub" / "c.md").unlink()
+
+    assert index.index_path(str(docs)) == 1
+    assert paths(index.search("session", [str(docs)], 5, 1000)) == ["a.md"]
+
+
+def test_bm25_ranks_frequent_and_rare_terms_higher(index, tmp_path):
+    root = tmp_path / "ranking"
+    root.mkdir()
+    (root / "once.md").write_text("cache\n" + "filler words here\n" * 5, encoding="utf-8")
+    (root / "often.md").write_text("cache cache cache\n" + "filler words here\n" * 5, encoding="utf-8")
+    (root / "rare.md").write_text("eviction\n" + "filler words here\n" * 5, encoding="utf-8")
+    for i in range(5):
+        (root / f"common{i}.md").write_text("cache\n" + "other filler words\n" * 5, encoding="utf-8")
+    index.index_path(str(root))
+
+    ranked = index.search("cache", [str(root)], 3, 1000)
+    assert paths(ranked)[0] == "often.md"
+    assert ranked == sorted(ranked, key=lambda chunk: chunk.score, reverse=True)
+    # A rare term outweighs a common one
+    assert paths(index.search("cache eviction", [str(root)], 1, 1000)) == ["rare.md"]
+
+
+def test_search_respects_top_k_and_token_budget(index, tmp_path):
+    root = tmp_path / "many"
+    root.mkdir()
+    for i in range(10):
+        (root / f"{i}.md").write_text(f"budget topic {i}\n" * 20, encoding="utf-8")
+    index.index_path(str(root))
+
+    assert len(index.search("budget", [str(root)], 4, 10_000)) == 4
+
+    cost = estimate_tokens((root / "0.md").read_text(encoding="utf-8"))
+    chunks = index.search("budget", [str(root)], 10, 3 * cost)
+    assert len(chunks) == 3
+    assert sum(estimate_tokens(chunk.text) for chunk in chunks) <= 3 * cost
+    assert index.search("budget", [str(root)], 10, cost - 1) == []
+
+
+def test_overlapping_roots_return_each_chunk_once(index, docs):
+    index.index_path(str(docs))
+    index.index_path(str(docs / "sub"))
+    index.index_path(str(docs / "a.md"))
+
+    chunks = index.search("session", [str(docs), str(docs / "sub"), str(docs / "a.md")], 10, 1000)
+    assert sorted(paths(chunks)) == ["a.md", "c.md"]
+    # A nested root alone still works
+    assert paths(index.search("session", [str(docs / "sub")], 10, 1000)) == ["c.md"]
+
+
+def test_removed_root_is_not_searched(index, docs):
+    index.index_path(str(docs))
+    index.remove_root(str(docs))
+
+    assert index.search("session", [str(docs)], 5, 1000) == []
+    assert index.index_path(str(docs)) == 3
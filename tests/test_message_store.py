@@ -0,0 +1,88 @@
+import base64
+import random
+import tracemalloc
+
+from includes.storage import MessageStore
+
+MESSAGES = 5000
+ANSWER_BYTES = 40 * 1024
+MAX_BYTES = 4 * 1024 * 1024
+HOT_BYTES = 1024 * 1024
+WARM_UP = 500
+# Allowed growth of traced memory after the warm-up
+TOLERANCE = 1024 * 1024
+
+
+def synthetic_answer(rng: random.Random) -> str:
+    """About ANSWER_BYTES of text that zlib only shrinks to roughly 75%"""
+    return base64.b64encode(rng.randbytes(ANSWER_BYTES * 3 // 4)).decode("ascii")
+
+
+def test_memory_stays_flat_under_ceiling():
+    rng = random.Random(1370)
+    store = MessageStore(max_bytes=MAX_BYTES, hot_bytes=HOT_BYTES)
+
+    tracemalloc.start()
+    try:
+        for _ in range(WARM_UP):
+            store.put("assistant", synthetic_answer(rng))
+        baseline, _ = tracemalloc.get_traced_memory()
+
+        for i in range(MESSAGES - WARM_UP):
+            store.put("assistant", synthetic_answer(rng))
+            assert store.memory_usage() <= MAX_BYTES
+            if i % 500 == 0:
+                current, _ = tracemalloc.get_traced_memory()
+                assert current - baseline < TOLERANCE
+
+        current, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert current - baseline < TOLERANCE
+    assert len(store) < MESSAGES  # The oldest answers were dropped
+
+
+def test_dropped_messages_return_none():
+    rng = random.Random(26)
+    store = MessageStore(max_bytes=MAX_BYTES, hot_bytes=HOT_BYTES)
+    first = store.put("assistant", synthetic_answer(rng))
+    for _ in range(2 * MAX_BYTES // ANSWER_BYTES):
+        last = store.put("assistant", synthetic_answer(rng))
+
+    assert store.get(first) is None
+    assert store.get_content(first) is None
+    assert store.get(last)["role"] == "assistant"
+
+
+def test_identical_messages_share_one_id():
+    store = MessageStore()
+    assert store.put("user", "hello") == store.put("user", "hello")
+    assert store.put("user", "hello") != store.put("assistant", "hello")
+
+
+def test_pinned_messages_are_never_dropped():
+    rng = random.Random(28)
+    store = MessageStore(max_bytes=MAX_BYTES, hot_bytes=HOT_BYTES)
+    pinned = [store.put("user", synthetic_answer(rng), pin=True) for _ in range(10)]
+    for _ in range(2 * MAX_BYTES // ANSWER_BYTES):
+        store.put("assistant", synthetic_answer(rng))
+
+    assert all(store.get_content(message_id) for message_id in pinned)
+
+    store.unpin(pinned)
+    for _ in range(2 * MAX_BYTES // ANSWER_BYTES):
+        store.put("assistant", synthetic_answer(rng))
+    assert all(store.get_content(message_id) is None for message_id in pinned)
+
+
+def test_compressed_messages_keep_their_id():
+    rng = random.Random(1)
+    store = MessageStore(max_bytes=MAX_BYTES, hot_bytes=HOT_BYTES)
+    answer = synthetic_answer(rng)
+    first = store.put("assistant", answer)
+    for _ in range(2 * HOT_BYTES // ANSWER_BYTES):
+        store.put("assistant", synthetic_answer(rng))
+
+    assert store.put("assistant", answer) == first
+    assert store.get_content(first) == answer
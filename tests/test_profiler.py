@@ -0,0 +1,15 @@
+import sys
+
+from includes.profiling.profiler import Profiler
+
+
+def sampled_stacks():
+    first = Profiler._stack_of(sys._getframe())
+    second = Profiler._stack_of(sys._getframe())
+    return first, second
+
+
+def test_samples_of_one_function_share_a_frame():
+    first, second = sampled_stacks()
+    assert first == second
+    assert first[-1] == f"sampled_stacks (test_profiler.py:{sampled_stacks.__code__.co_firstlineno})"
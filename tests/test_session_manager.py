@@ -0,0 +1,148 @@
+import json
+
+from controllers.ai import session_manager
+from controllers.ai.session_manager import SessionManager
+from includes.storage import MessageStore, SessionStore
+
+
+def exchange(i: int):
+    return (
+        {"role": "user", "content": f"question {i}"},
+        {"role": "assistant", "content": f"answer {i}"},
+    )
+
+
+def reopen(directory) -> SessionManager:
+    return SessionManager(MessageStore(), None, SessionStore(directory))
+
+
+def test_resume_loads_recent_window(tmp_path, monkeypatch):
+    monkeypatch.setattr(session_manager, "RECENT_WINDOW", 4)
+    manager = reopen(tmp_path)
+    session = manager.active_session
+    for i in range(5):
+        assert manager.commit(session, session.generation, 10 + i, *exchange(i))
+    manager._store.close()
+
+    resumed = reopen(tmp_path)
+    restored = resumed.active_session
+    assert restored.session_id == session.session_id
+    assert restored.num_tokens == 14
+    assert resumed.messages(restored) == [*exchange(3), *exchange(4)]
+    assert resumed.message_store.get_content(restored.last_answer_id) == "answer 4"
+
+
+def test_resume_does_not_start_with_an_answer(tmp_path, monkeypatch):
+    monkeypatch.setattr(session_manager, "RECENT_WINDOW", 3)
+    manager = reopen(tmp_path)
+    session = manager.active_session
+    for i in range(3):
+        manager.commit(session, session.generation, 0, *exchange(i))
+    manager._store.close()
+
+    resumed = reopen(tmp_path)
+    messages = resumed.messages(resumed.active_session)
+    assert messages == list(exchange(2))
+
+
+def test_resume_skips_torn_lines(tmp_path, monkeypatch):
+    monkeypatch.setattr(session_manager, "RECENT_WINDOW", 4)
+    manager = reopen(tmp_path)
+    session = manager.active_session
+    manager.commit(session, session.generation, 0, *exchange(0))
+    manager._store.close()
+    with open(tmp_path / f"{session.session_id}.jsonl", "a", encoding="utf-8") as f:
+        f.write(json.dumps(exchange(1)[0]) + "\n" + '{"role": "assis')
+
+    # The question whose answer was torn is not sent to the model
+    resumed = reopen(tmp_path)
+    assert resumed.messages(resumed.active_session) == list(exchange(0))
+
+
+def test_only_the_active_session_is_loaded(tmp_path):
+    manager = reopen(tmp_path)
+    first = manager.active_session
+    second = manager.get_session(manager.createSession(""))
+    manager.commit(first, first.generation, 0, *exchange(0))
+    manager.commit(second, second.generation, 0, *exchange(1))
+    manager.setActiveSession(second.session_id)
+    manager._store.close()
+
+    resumed = reopen(tmp_path)
+    assert [s.title for s in resumed.all_sessions()] == ["Chat 1", "Chat 2"]
+    assert resumed.activeSessionId == second.session_id
+    assert not resumed.get_session(first.session_id).loaded
+
+    resumed.setActiveSession(first.session_id)
+    assert resumed.messages(resumed.active_session) == list(exchange(0))
+
+
+def test_late_answer_of_closed_session_is_dropped(tmp_path):
+    manager = reopen(tmp_path)
+    session = manager.get_session(manager.createSession(""))
+    generation = session.generation
+    manager.closeSession(session.session_id)
+
+    assert not manager.commit(session, generation, 0, *exchange(0))
+    manager._store.close()
+    assert not (tmp_path / f"{session.session_id}.jsonl").exists()
+
+
+def test_answer_of_cleared_history_is_dropped(tmp_path):
+    manager = reopen(tmp_path)
+    session = manager.active_session
+    generation = session.generation
+    manager.clear_session(session)
+
+    assert not manager.commit(session, generation, 0, *exchange(0))
+    assert manager.messages(session) == []
+
+
+def test_history_survives_display_page_ins(tmp_path, monkeypatch):
+    monkeypatch.setattr(session_manager, "RECENT_WINDOW", 4)
+    manager = reopen(tmp_path)
+    session = manager.active_session
+    for i in range(200):
+        manager.commit(session, session.generation, 0, *exchange(i))
+    manager._store.close()
+
+    # A store that only has room for a few display-only messages
+    resumed = SessionManager(MessageStore(max_bytes=2048, hot_bytes=512), None,
+                             SessionStore(tmp_path))
+    session_id = resumed.activeSessionId
+    shown = resumed.recentMessages(session_id)
+    while True:
+        page = resumed.olderMessages(session_id)
+        if not page:
+            break
+        shown = page + shown
+
+    assert len(shown) == 400
+    assert resumed.messages(resumed.active_session) == [*exchange(198), *exchange(199)]
+    # Evicted texts are read back from the session file
+    first = shown[0]
+    assert resumed.message_store.get_content(first["messageId"]) is None
+    assert resumed.storedMessageText(session_id, first["offset"]) == "question 0"
+
+
+def test_unanswered_history_messages_are_not_sent(tmp_path):
+    manager = reopen(tmp_path)
+    session = manager.active_session
+    manager.commit(session, session.generation, 0, *exchange(0))
+    manager.commit(session, session.generation, 0, *exchange(1))
+    # Simulate a lost answer
+    answer = manager.message_store.put("assistant", "answer 0")
+    session.forget({answer})
+
+    assert manager.messages(session) == list(exchange(1))
+
+
+def test_closing_a_session_reports_its_documents(tmp_path):
+    manager = reopen(tmp_path)
+    session = manager.get_session(manager.createSession(""))
+    manager.set_documents(session, ("/docs",))
+    closed = []
+    manager.sessionClosed.connect(closed.append)
+
+    manager.closeSession(session.session_id)
+    assert closed == [["/docs"]]
@@ -0,0 +1,137 @@
+import json
+import random
+
+import pytest
+
+from includes.storage import SessionStore
+from includes.storage import session_store
+from includes.storage.session_store import read_lines_backwards
+
+
+@pytest.fixture
+def small_blocks(monkeypatch):
+    """Make reads cross many block borders"""
+    monkeypatch.setattr(session_store, "_READ_BLOCK", 7)
+
+
+def record(i: int) -> dict:
+    return {"role": "user" if i % 2 == 0 else "assistant", "content": f"message {i}", "ts": i}
+
+
+def without_offsets(messages):
+    return [{k: v for k, v in m.items() if k != "offset"} for m in messages]
+
+
+def write_records(store: SessionStore, session_id: str, records):
+    store.append(session_id, records)
+    store.close()
+
+
+@pytest.mark.parametrize("block", [7, 64, 64 * 1024])
+def test_read_lines_backwards_matches_forward_read(tmp_path, monkeypatch, block):
+    monkeypatch.setattr(session_store, "_READ_BLOCK", block)
+    rng = random.Random(block)
+    lines = [("x" * rng.randint(0, 40)).encode() for _ in range(200)]
+    path = tmp_path / "lines.txt"
+    path.write_bytes(b"\n".join(lines) + b"\n")
+    expected = [line for line in lines if line]
+
+    end = path.stat().st_size
+    collected = []
+    while end > 0:
+        page, end = read_lines_backwards(path, end, 9)
+        assert page
+        assert end == page[0][0]
+        collected = page + collected
+    assert [line for _, line in collected] == expected
+
+    data = path.read_bytes()
+    for offset, line in collected:
+        assert data[offset:offset + len(line)] == line
+
+
+def test_read_lines_backwards_returns_offset_of_first_line(tmp_path, small_blocks):
+    path = tmp_path / "lines.txt"
+    path.write_bytes(b"one\ntwo\nthree\n")
+
+    lines, start = read_lines_backwards(path, path.stat().st_size, 2)
+    assert lines == [(4, b"two"), (8, b"three")]
+    assert start == 4
+
+    lines, start = read_lines_backwards(path, start, 2)
+    assert lines == [(0, b"one")]
+    assert start == 0
+
+
+def test_read_lines_backwards_without_trailing_newline(tmp_path, small_blocks):
+    path = tmp_path / "lines.txt"
+    path.write_bytes(b"one\ntwo")
+
+    lines, start = read_lines_backwards(path, path.stat().st_size, 5)
+    assert lines == [(0, b"one"), (4, b"two")]
+    assert start == 0
+
+
+def test_load_messages_pages_from_newest_to_oldest(tmp_path, small_blocks):
+    records = [record(i) for i in range(25)]
+    write_records(SessionStore(tmp_path), "s", records)
+
+    store = SessionStore(tmp_path)
+    page, offset = store.load_messages("s", 10)
+    assert without_offsets(page) == records[15:]
+    page, offset = store.load_messages("s", 10, offset)
+    assert without_offsets(page) == records[5:15]
+    page, offset = store.load_messages("s", 10, offset)
+    assert without_offsets(page) == records[:5]
+    assert offset == 0
+
+
+def test_load_message_by_offset(tmp_path):
+    records = [record(i) for i in range(5)]
+    write_records(SessionStore(tmp_path), "s", records)
+
+    store = SessionStore(tmp_path)
+    page, _ = store.load_messages("s", 5)
+    for message, expected in zip(page, records):
+        assert store.load_message("s", message["offset"]) == expected
+    assert store.load_message("s", 10 ** 6) is None
+    assert store.load_message("missing", 0) is None
+
+
+def test_load_messages_skips_torn_lines(tmp_path):
+    store = SessionStore(tmp_path)
+    path = tmp_path / "s.jsonl"
+    path.write_text(json.dumps(record(0)) + "\n" + '{"role": "assis', encoding="utf-8")
+
+    # The next append starts on a fresh line
+    write_records(store, "s", [record(2)])
+
+    page, _ = SessionStore(tmp_path).load_messages("s", 10)
+    assert without_offsets(page) == [record(0), record(2)]
+
+
+def test_missing_session_has_no_messages(tmp_path):
+    assert SessionStore(tmp_path).load_messages("missing", 10) == ([], 0)
+
+
+def test_clear_and_delete(tmp_path):
+    store = SessionStore(tmp_path)
+    store.append("a", [record(0), record(1)])
+    store.append("b", [record(0), record(1)])
+    store.clear("a")
+    store.delete("b")
+    store.close()
+
+    store = SessionStore(tmp_path)
+    assert store.load_messages("a", 10) == ([], 0)
+    assert not (tmp_path / "b.jsonl").exists()
+
+
+def test_manifest_round_trip(tmp_path):
+    manifest = {"active": "a", "sessions": [{"id": "a", "title": "Chat 1"}]}
+    store = SessionStore(tmp_path)
+    store.save_manifest(manifest)
+    store.close()
+
+    assert SessionStore(tmp_path).load_manifest() == manifest
+    assert SessionStore(tmp_path / "empty").load_manifest() == {"active": "", "sessions": []}